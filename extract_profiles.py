@@ -1,108 +1,591 @@
+import asyncio
+import base64
 import logging
+import logging.handlers
 import json
+import re
 import time
-import random
 import argparse
+import httpx
+import orjson
+import mycdp
+import psutil
 from seleniumbase import SB
-from bs4 import BeautifulSoup
+from profile_fields import extract_profile_info_from_json
 import os
+import queue
+import shutil
+import tempfile
+import threading
+import uuid
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_FORMAT = '%(asctime)s - %(processName)s - %(levelname)s - %(message)s'
+logger = logging.getLogger(__name__)
 
-def extract_profile_info(sb, url, batch_number, link_index):
-    logging.info(f"Extracting profile info from URL: {url}")
+# Each Chrome instance runs in its own process so drivers never share an interpreter;
+# all of them pull from one shared link queue
+NUM_CHROME_INSTANCES = int(os.environ.get("NUM_CHROME_INSTANCES", "3"))
+# Concurrent plain-HTTP fetches tried before any browser is started
+HTTP_CONCURRENCY = int(os.environ.get("HTTP_CONCURRENCY", "5"))
+# Politeness limits on the proxy: one budget for the HTTP client, one shared by all Chrome instances
+HTTP_REQUESTS_PER_SECOND = float(os.environ.get("HTTP_REQUESTS_PER_SECOND", "3"))
+BROWSER_REQUESTS_PER_SECOND = float(os.environ.get("BROWSER_REQUESTS_PER_SECOND", str(NUM_CHROME_INSTANCES)))
+
+# Keep each Chrome instance lean: a few same-site tabs need few renderers, and background
+# fetches (component updates, safe-browsing lists) would otherwise go through the proxy
+CHROMIUM_ARGS = ",".join((
+    "--renderer-process-limit=2",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--blink-settings=imagesEnabled=false",
+))
+
+# Pages loading at once in each Chrome instance; the next links load while the oldest one is read
+TABS_PER_BROWSER = max(1, int(os.environ.get("TABS_PER_BROWSER", "3")))
+
+# Only the HTML document carries __NEXT_DATA__; everything else is dropped at the network layer
+BLOCKED_URL_PATTERNS = (
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg",
+    "*.woff", "*.woff2", "*.ttf", "*.css", "*.mp4",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+)
+
+# Persistent Chrome profile per instance so HTTP cache and TLS state survive across runs (cached in CI)
+CHROME_PROFILE_DIR = os.path.abspath("chrome_profiles")
+
+# Append a fresh "-session-<id>" to the proxy username for every new browser so restarts get a new exit IP
+ROTATE_PROXY_SESSIONS = os.environ.get("ROTATE_PROXY_SESSIONS") == "1"
+
+# Artifact file name: kind, batch number, link index, timestamp in ns and extension
+DEBUG_ARTIFACT_NAME = "%s_batch_%s_link_%s_%d.%s"
+# Keep artifacts for only one in every N failed loads per Chrome instance, and never more than a fixed number
+DEBUG_ARTIFACT_SAMPLE_EVERY = int(os.environ.get("DEBUG_ARTIFACT_SAMPLE_EVERY", "10"))
+DEBUG_ARTIFACT_MAX_PER_INSTANCE = int(os.environ.get("DEBUG_ARTIFACT_MAX_PER_INSTANCE", "20"))
+
+# Matches the server-rendered Next.js payload without building a DOM for the whole page
+NEXT_DATA_RE = re.compile(r'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S)
+# Same pattern for raw HTTP bodies, so the response never has to be decoded to str
+NEXT_DATA_BYTES_RE = re.compile(NEXT_DATA_RE.pattern.encode(), re.S)
+
+# Returns just the payload text so the whole DOM isn't serialized over CDP on every poll.
+# While the document is still being parsed the script text may be only partly streamed in, so nothing is returned yet.
+NEXT_DATA_JS = ("(() => { if (document.readyState === 'loading') return null; "
+                "const el = document.getElementById('__NEXT_DATA__'); return el ? el.textContent : null; })()")
+
+# Upper bound on how long a browser page load may take to expose __NEXT_DATA__
+OPERATION_TIMEOUT_SECONDS = 8
+NEXT_DATA_POLL_SECONDS = 0.15
+
+# Chrome's heap keeps growing over a long session, so each instance is recycled after this many pages
+MAX_PAGES_PER_BROWSER = int(os.environ.get("MAX_PAGES_PER_BROWSER", "40"))
+
+# Consecutive failed links after which the cheap cookie reset gives way to a full driver restart
+HARD_RESET_AFTER = 3
+
+REAL_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+HTTP_HEADERS = {
+    "User-Agent": REAL_UA,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+# Markers of the bot-check interstitial served instead of the profile page
+CHALLENGE_MARKERS = (b"px-captcha", b"Press & Hold")
+
+class RateLimiter:
+    # Spaces requests at least min_interval apart; a request that was already slow waits for nothing
+    def __init__(self, requests_per_second):
+        self.min_interval = 1 / requests_per_second
+        self.last = 0.0
+
+    def _reserve(self):
+        now = time.monotonic()
+        delay = max(0.0, self.last + self.min_interval - now)
+        self.last = now + delay
+        return delay
+
+    def wait(self):
+        time.sleep(self._reserve())
+
+    async def wait_async(self):
+        await asyncio.sleep(self._reserve())
+
+class SharedRateLimiter(RateLimiter):
+    # Same spacing, but the last reserved slot lives in shared memory so every worker process draws from one budget
+    def __init__(self, requests_per_second, shared_last):
+        super().__init__(requests_per_second)
+        self.shared_last = shared_last
+
+    def _reserve(self):
+        with self.shared_last.get_lock():
+            now = time.monotonic()
+            delay = max(0.0, self.shared_last.value + self.min_interval - now)
+            self.shared_last.value = now + delay
+        return delay
+
+# Set in each worker process by init_worker
+browser_limiter = None
+
+async def extract_profile_info_http(client, semaphore, limiter, url):
+    # __NEXT_DATA__ is server-rendered, so a plain GET is enough when the proxy isn't challenged
+    async with semaphore:
+        await limiter.wait_async()
+        try:
+            response = await client.get(url)
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            # InvalidURL (control characters, over-long links) is not an HTTPError; let Chrome deal with the link
+            logger.warning("HTTP fetch failed for %s: %s", url, e)
+            return {}
+    if response.status_code != 200:
+        logger.warning("HTTP fetch returned status %s for %s, falling back to browser", response.status_code, url)
+        return {}
+    match = NEXT_DATA_BYTES_RE.search(response.content)
+    if not match:
+        if any(marker in response.content for marker in CHALLENGE_MARKERS):
+            logger.warning("HTTP fetch for %s got a bot challenge, falling back to browser", url)
+        else:
+            logger.warning("No '__NEXT_DATA__' in HTTP response for %s, falling back to browser", url)
+        return {}
+    try:
+        display_user = parse_display_user(match.group(1))
+    except orjson.JSONDecodeError as e:
+        logger.warning("Invalid '__NEXT_DATA__' JSON in HTTP response for %s: %s", url, e)
+        return {}
+    if not display_user:
+        # An empty displayUser would be saved as an all-None record and never retried; let Chrome have a go
+        logger.warning("No displayUser in HTTP response for %s, falling back to browser", url)
+        return {}
+    profile_info = extract_profile_info_from_json(display_user)
+    logger.info("Extracted profile info via HTTP: %s", profile_info)
+    return profile_info
+
+async def prefetch_profiles_http(links, proxy_selenium, results_file):
+    semaphore = asyncio.Semaphore(HTTP_CONCURRENCY)
+    limiter = RateLimiter(HTTP_REQUESTS_PER_SECOND)
+    resolved = set()
+    # One pooled client for the whole batch: idle tunnels to the proxy stay open between fetches
+    limits = httpx.Limits(max_connections=HTTP_CONCURRENCY, max_keepalive_connections=HTTP_CONCURRENCY,
+                          keepalive_expiry=60)
+    async with httpx.AsyncClient(http2=True, proxy=f"http://{proxy_selenium}", headers=HTTP_HEADERS, limits=limits,
+                                 follow_redirects=True, timeout=OPERATION_TIMEOUT_SECONDS) as client:
+        async def fetch(link):
+            return link, await extract_profile_info_http(client, semaphore, limiter, link)
+        
+        for next_result in asyncio.as_completed([fetch(link) for link in links]):
+            link, profile_info = await next_result
+            if profile_info:
+                results_file.write(serialize_result(link, profile_info))
+                results_file.flush()
+                resolved.add(link)
+    return resolved
+
+class DebugArtifactWriter:
+    # Writes debug files from a background thread so a failing worker never waits on disk
+    def __init__(self, sample_every, max_captures):
+        # Screenshots and page-source dumps of failed loads are only written with --debug_artifacts
+        self.enabled = False
+        self.sample_every = max(1, sample_every)
+        self.max_captures = max_captures
+        self.failures = 0
+        self.captures = 0
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def should_capture(self):
+        if not self.enabled:
+            return False
+        self.failures += 1
+        if self.captures >= self.max_captures or (self.failures - 1) % self.sample_every:
+            return False
+        self.captures += 1
+        return True
+
+    def put(self, name, data):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        self.queue.put((name, data))
+
+    def flush(self):
+        if self.thread is not None:
+            self.queue.join()
+
+    def _run(self):
+        while True:
+            name, data = self.queue.get()
+            try:
+                with open(name, 'wb') as f:
+                    f.write(data)
+                logger.info("Debug artifact saved: %s", name)
+            except OSError as e:
+                logger.error("Failed to save debug artifact %s: %s", name, e)
+            finally:
+                self.queue.task_done()
+
+debug_artifacts = DebugArtifactWriter(DEBUG_ARTIFACT_SAMPLE_EVERY, DEBUG_ARTIFACT_MAX_PER_INSTANCE)
+
+def send_cdp(cdp, tab, command):
+    # Always addressed to an explicit tab: cdp.page keeps pointing at the first tab after switch_to_tab
+    return cdp.loop.run_until_complete(tab.send(command))
+
+def capture_screenshot_png(cdp, tab):
+    return base64.b64decode(send_cdp(cdp, tab, mycdp.page.capture_screenshot()))
+
+def extract_profile_info(cdp, tab, url, batch_number, link_index):
+    # Reads the page already navigating in tab, which the caller has switched to (see start_navigation)
+    logger.info("Extracting profile info from URL: %s", url)
     
     try:
-        sb.cdp.open(url)
-        logging.info(f"Page opened successfully: {url}")
-        time.sleep(7)
+        # Poll for the payload instead of sleeping a fixed amount; give up after the timeout
+        deadline = time.monotonic() + OPERATION_TIMEOUT_SECONDS
+        next_data = cdp.evaluate(NEXT_DATA_JS)
+        while not next_data and time.monotonic() < deadline:
+            time.sleep(NEXT_DATA_POLL_SECONDS)
+            next_data = cdp.evaluate(NEXT_DATA_JS)
+        if not next_data:
+            # A hung load keeps the renderer busy after we give up on it; stop it before the fallback and the next link
+            send_cdp(cdp, tab, mycdp.page.stop_loading())
         
         # Check if page loaded
-        current_url = sb.cdp.get_current_url()
-        logging.info(f"Current URL after load: {current_url}")
-        
-        html = sb.cdp.get_page_source()
-        logging.info(f"Page source length: {len(html)} characters")
+        current_url = cdp.get_current_url()
+        logger.info("Current URL after load: %s", current_url)
         
-        # Check for common indicators that page loaded
-        if "zillow" in html.lower():
-            logging.info("Zillow content detected in page")
-        else:
-            logging.warning("No Zillow content detected in page")
-            
-        soup = BeautifulSoup(html, 'html.parser')
-        script_tag = soup.find('script', id='__NEXT_DATA__')
+        html = None
+        if not next_data:
+            # Fall back to the full page source only when the element lookup came back empty
+            html = cdp.get_page_source()
+            logger.info("Page source length: %s characters", len(html))
+            match = NEXT_DATA_RE.search(html)
+            if match:
+                next_data = match.group(1)
         
-        if script_tag:
-            json_data = json.loads(script_tag.string)
-            profile_info = extract_profile_info_from_json(json_data)
-            logging.info(f"Extracted profile info: {profile_info}")
+        if next_data:
+            display_user = parse_display_user(next_data)
+            profile_info = extract_profile_info_from_json(display_user)
+            logger.info("Extracted profile info: %s", profile_info)
         else:
-            logging.error("Script tag with id '__NEXT_DATA__' not found.")
-            # Take screenshot for debugging
-            screenshot_name = f"debug_screenshot_batch_{batch_number}_link_{link_index}_{int(time.time())}.png"
-            try:
-                sb.save_screenshot(screenshot_name)
-                logging.info(f"Screenshot saved: {screenshot_name}")
-                
-                # Also save page source for debugging
-                html_name = f"debug_page_source_batch_{batch_number}_link_{link_index}_{int(time.time())}.html"
-                with open(html_name, 'w', encoding='utf-8') as f:
-                    f.write(html)
-                logging.info(f"Page source saved: {html_name}")
-                
-            except Exception as screenshot_error:
-                logging.error(f"Failed to save screenshot: {screenshot_error}")
+            logger.error("Script tag with id '__NEXT_DATA__' not found.")
+            if debug_artifacts.should_capture():
+                # Take screenshot for debugging
+                stamp = time.time_ns()
+                screenshot_name = DEBUG_ARTIFACT_NAME % ("debug_screenshot", batch_number, link_index, stamp, "png")
+                try:
+                    debug_artifacts.put(screenshot_name, capture_screenshot_png(cdp, tab))
+                    
+                    # Also save page source for debugging
+                    html_name = DEBUG_ARTIFACT_NAME % ("debug_page_source", batch_number, link_index, stamp, "html")
+                    debug_artifacts.put(html_name, html.encode('utf-8'))
+                    
+                except Exception as screenshot_error:
+                    logger.error("Failed to capture screenshot: %s", screenshot_error)
             
             return {}
     except Exception as e:
-        logging.error(f"Failed to extract profile info: {e}")
-        # Take screenshot for debugging exceptions too
-        screenshot_name = f"error_screenshot_batch_{batch_number}_link_{link_index}_{int(time.time())}.png"
-        try:
-            sb.save_screenshot(screenshot_name)
-            logging.info(f"Error screenshot saved: {screenshot_name}")
-        except Exception as screenshot_error:
-            logging.error(f"Failed to save error screenshot: {screenshot_error}")
+        logger.error("Failed to extract profile info: %s", e)
+        if debug_artifacts.should_capture():
+            # Take screenshot for debugging exceptions too
+            screenshot_name = DEBUG_ARTIFACT_NAME % ("error_screenshot", batch_number, link_index, time.time_ns(), "png")
+            try:
+                debug_artifacts.put(screenshot_name, capture_screenshot_png(cdp, tab))
+            except Exception as screenshot_error:
+                logger.error("Failed to capture error screenshot: %s", screenshot_error)
         return {}
     return profile_info
 
-def extract_profile_info_from_json(json_data):
-    profile_info = {}
-    try:
-        profile_info["Name"] = json_data["props"]["pageProps"]["displayUser"]["name"]
-    except KeyError:
-        profile_info["Name"] = None
-    try:
-        profile_info["Personal Phone"] = json_data["props"]["pageProps"]["displayUser"]["phoneNumbers"]["cell"]
-    except KeyError:
-        profile_info["Personal Phone"] = None
-    try:
-        profile_info["Business Phone"] = json_data["props"]["pageProps"]["displayUser"]["phoneNumbers"]["business"]
-    except KeyError:
-        profile_info["Business Phone"] = None
-    try:
-        profile_info["Email"] = json_data["props"]["pageProps"]["displayUser"]["email"]
-    except KeyError:
-        profile_info["Email"] = None
-    try:
-        business_address = json_data["props"]["pageProps"]["displayUser"]["businessAddress"]
-        profile_info["Address"] = f"{business_address['address1']}, {business_address['city']}, {business_address['state']} {business_address['postalCode']}"
-    except KeyError:
-        profile_info["Address"] = None
+def parse_display_user(next_data):
+    # Only props.pageProps.displayUser is read; the rest of the Next.js page state is dropped right away
+    # Any level that isn't an object (null, a list, ...) means there is no profile to read
+    node = orjson.loads(next_data)
+    for key in ("props", "pageProps", "displayUser"):
+        if not isinstance(node, dict):
+            return {}
+        node = node.get(key)
+    return node if isinstance(node, dict) else {}
+
+def serialize_result(link, profile_info):
+    return orjson.dumps({"profile_link": link, "profile_data": profile_info}, option=orjson.OPT_APPEND_NEWLINE)
+
+def build_proxy(proxy_credentials):
+    proxy_username, proxy_password, proxy_dns = proxy_credentials
+    if ROTATE_PROXY_SESSIONS:
+        proxy_username = f"{proxy_username}-session-{uuid.uuid4().hex[:8]}"
+    return f"{proxy_username}:{proxy_password}@{proxy_dns}"
+
+def quit_driver(driver, profile_dir=None):
     try:
-        profile_info["Business Name"] = json_data["props"]["pageProps"]["displayUser"]["businessName"]
-    except KeyError:
-        profile_info["Business Name"] = None
+        driver.quit()
+    except Exception as e:
+        logger.warning("Failed to quit old driver: %s", e)
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+def block_resources(cdp, tab):
+    # Blocked URLs are per CDP target, so they are set again for every new tab and driver.
+    # Pages still load without the block list, just slower, so a failure here is not fatal.
     try:
-        profile_info["Ratings Count"] = json_data["props"]["pageProps"]["displayUser"]["ratings"]["count"]
-    except KeyError:
-        profile_info["Ratings Count"] = None
+        send_cdp(cdp, tab, mycdp.network.enable())
+        send_cdp(cdp, tab, mycdp.network.set_blocked_urls(urls=list(BLOCKED_URL_PATTERNS)))
+    except Exception as e:
+        logger.warning("Failed to install the blocked URL list: %s", e)
+
+def activate_cdp_mode(sb):
+    # Returns the CDP handle for the new session; callers keep it until the driver is replaced
+    sb.activate_cdp_mode("about:blank", tzone="America/Panama")
+    cdp = sb.cdp
+    block_resources(cdp, cdp.page)
+    return cdp
+
+def soft_reset_session(cdp, clear_cookies=True):
+    # Wipe the failed origin's storage, and optionally all cookies, without restarting Chrome.
+    # Cookies are browser-wide, so callers skip them while other tabs are still loading;
+    # a session that stays blocked is then replaced by the hard restart instead.
+    cdp.evaluate("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+    if clear_cookies:
+        cdp.clear_cookies()
+    cdp.open("about:blank")
+
+def open_tabs(cdp):
+    # The first tab is the one CDP mode opened; the rest start blank
+    tabs = [cdp.page]
+    for _ in range(TABS_PER_BROWSER - 1):
+        tab = cdp.loop.run_until_complete(cdp.driver.get("about:blank", new_tab=True))
+        block_resources(cdp, tab)
+        tabs.append(tab)
+    return tabs
+
+def start_navigation(cdp, tab, url):
+    # Page.navigate only answers once the navigation commits (response headers are in), so it gets the same
+    # time limit as a page load; the rest of the page then keeps loading while other tabs are read.
+    # Returns False when the navigation failed outright, so the link fails without polling an error page.
+    browser_limiter.wait()
     try:
-        profile_info["Ratings Average"] = json_data["props"]["pageProps"]["displayUser"]["ratings"]["average"]
-    except KeyError:
-        profile_info["Ratings Average"] = None
-    return profile_info
+        result = cdp.loop.run_until_complete(
+            asyncio.wait_for(tab.send(mycdp.page.navigate(url=url)), OPERATION_TIMEOUT_SECONDS))
+    except asyncio.TimeoutError:
+        logger.error("Navigation to %s did not commit within %s seconds", url, OPERATION_TIMEOUT_SECONDS)
+        try:
+            send_cdp(cdp, tab, mycdp.page.stop_loading())
+        except Exception as e:
+            logger.warning("Failed to stop loading %s: %s", url, e)
+        return False
+    except Exception as e:
+        logger.error("Failed to start navigation to %s: %s", url, e)
+        return False
+    error_text = result[2]
+    if error_text:
+        logger.error("Navigation to %s failed: %s", url, error_text)
+        return False
+    logger.debug("Navigation committed: %s", url)
+    return True
+
+def reset_tabs(cdp, in_flight, link_queue):
+    # A new driver has none of the old tabs: hand the pending links back to the shared queue,
+    # where any instance can pick them up, and return a fresh set of tabs
+    while in_flight:
+        _, i, link, _ = in_flight.popleft()
+        link_queue.put((i, link))
+    return open_tabs(cdp)
+
+def launch_driver(sb, proxy_credentials):
+    # Replacement drivers get their own throwaway profile: the old one may still hold the persistent profile's lock
+    profile_dir = tempfile.mkdtemp(prefix="chrome_restart_")
+    sb.get_new_driver(undetectable=True, proxy=build_proxy(proxy_credentials), user_data_dir=profile_dir,
+                      chromium_arg=CHROMIUM_ARGS)
+    return profile_dir, activate_cdp_mode(sb)
+
+def restart_driver(sb, proxy_credentials, old_profile_dir=None):
+    # Bring up the replacement first and tear the blocked browser down off the hot path
+    old_driver = sb.driver
+    profile_dir, cdp = launch_driver(sb, proxy_credentials)
+    threading.Thread(target=quit_driver, args=(old_driver, old_profile_dir), daemon=True).start()
+    return profile_dir, cdp
+
+def recycle_driver(sb, proxy_credentials, old_profile_dir=None):
+    # A memory recycle quits the old browser before launching, so the instance never holds two Chromes at once
+    quit_driver(sb.driver, old_profile_dir)
+    return launch_driver(sb, proxy_credentials)
+
+def worker_rss_mb():
+    # The worker plus the chromedriver/Chrome processes it spawned
+    process = psutil.Process()
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss / (1024 * 1024)
+
+def configure_worker_logging(log_queue):
+    # Workers hand records to the parent's QueueListener so lines from different Chrome instances never interleave
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+
+def init_worker(log_queue, browser_slot, save_debug_artifacts):
+    global browser_limiter
+    configure_worker_logging(log_queue)
+    debug_artifacts.enabled = save_debug_artifacts
+    browser_limiter = SharedRateLimiter(BROWSER_REQUESTS_PER_SECOND, browser_slot)
+
+def browser_worker(link_queue, worker_id, batch_number, proxy_credentials, results_queue):
+    logger.info("Worker %s: starting", worker_id)
+    processed = 0
+    
+    consecutive_failures = 0
+    pages_since_launch = 0
+    restart_profile_dir = None
+    
+    # One Chrome instance per worker, reused until blocked or recycled and driving TABS_PER_BROWSER tabs;
+    # restarts get a fresh temporary profile
+    user_data_dir = os.path.join(CHROME_PROFILE_DIR, f"instance_{worker_id}")
+    with SB(uc=True, proxy=build_proxy(proxy_credentials), headless=True, user_data_dir=user_data_dir,
+            chromium_arg=CHROMIUM_ARGS) as sb:
+        cdp = activate_cdp_mode(sb)
+        # The cached profile is only kept for its HTTP cache; cookies from the last run may belong to a blocked session
+        cdp.clear_cookies()
+        free_tabs = open_tabs(cdp)
+        # (tab, index, link, navigated) for links already navigating, oldest first
+        in_flight = deque()
+        
+        while True:
+            # Pull links from the shared queue until it is empty, so a slow instance never holds work others could do
+            while free_tabs:
+                try:
+                    i, link = link_queue.get_nowait()
+                except queue.Empty:
+                    break
+                tab = free_tabs.pop()
+                navigated = start_navigation(cdp, tab, link)
+                in_flight.append((tab, i, link, navigated))
+            if not in_flight:
+                break
+            
+            tab, i, link, navigated = in_flight.popleft()
+            logger.info("Worker %s: processing profile %s: %s", worker_id, i, link)
+            
+            while True:
+                try:
+                    cdp.switch_to_tab(tab)
+                    profile_info = extract_profile_info(cdp, tab, link, batch_number, i) if navigated else {}
+                    if not profile_info:
+                        consecutive_failures += 1
+                        if consecutive_failures < HARD_RESET_AFTER:
+                            # Drop the session state and retry before paying for a Chrome restart
+                            logger.warning("Profile extraction failed for %s, resetting the session and retrying...", link)
+                            soft_reset_session(cdp, clear_cookies=not in_flight)
+                            navigated = start_navigation(cdp, tab, link)
+                            continue
+                        # Session might be blocked, get new driver
+                        logger.warning("Profile extraction failed for %s, refreshing driver...", link)
+                        restart_profile_dir, cdp = restart_driver(sb, proxy_credentials, restart_profile_dir)
+                        free_tabs = reset_tabs(cdp, in_flight, link_queue)
+                        tab = free_tabs.pop()
+                        navigated = start_navigation(cdp, tab, link)
+                        consecutive_failures = 0
+                        pages_since_launch = 0
+                        continue
+                    else:
+                        logger.info("Successfully extracted profile info for %s", link)
+                        consecutive_failures = 0
+                        pages_since_launch += 1
+                        break
+                except Exception as e:
+                    logger.error("Error processing %s: %s", link, e)
+                    # Try refreshing the driver
+                    try:
+                        restart_profile_dir, cdp = restart_driver(sb, proxy_credentials, restart_profile_dir)
+                        free_tabs = reset_tabs(cdp, in_flight, link_queue)
+                        tab = free_tabs.pop()
+                        navigated = start_navigation(cdp, tab, link)
+                        consecutive_failures = 0
+                        pages_since_launch = 0
+                    except Exception as refresh_error:
+                        logger.error("Failed to refresh driver: %s", refresh_error)
+                        profile_info = {}
+                        break
+            
+            free_tabs.append(tab)
+            results_queue.put(serialize_result(link, profile_info))
+            processed += 1
+            
+            if pages_since_launch >= MAX_PAGES_PER_BROWSER:
+                logger.info("Worker %s: recycling Chrome after %s pages (RSS %.0f MB)",
+                            worker_id, pages_since_launch, worker_rss_mb())
+                try:
+                    restart_profile_dir, cdp = recycle_driver(sb, proxy_credentials, restart_profile_dir)
+                    free_tabs = reset_tabs(cdp, in_flight, link_queue)
+                except Exception as refresh_error:
+                    logger.error("Failed to recycle driver: %s", refresh_error)
+                pages_since_launch = 0
+    
+    if restart_profile_dir:
+        shutil.rmtree(restart_profile_dir, ignore_errors=True)
+    debug_artifacts.flush()
+    logger.info("Worker %s: finished after %s links", worker_id, processed)
+
+def drain_results_queue(results_queue, futures, results_file):
+    # Checking the futures before each get() guarantees nothing is left once an empty read follows completion
+    while True:
+        workers_done = all(future.done() for future in futures)
+        try:
+            record = results_queue.get(timeout=1)
+        except queue.Empty:
+            if workers_done:
+                break
+            continue
+        results_file.write(record)
+        results_file.flush()
+
+def iter_jsonl_records(jsonl_name):
+    # Yields each record with the byte offset of its line so it can be read back later without keeping it
+    offset = 0
+    with open(jsonl_name, 'rb') as f:
+        for line in f:
+            try:
+                yield offset, orjson.loads(line)
+            except orjson.JSONDecodeError:
+                logger.warning("Skipping truncated line in %s", jsonl_name)
+            offset += len(line)
+
+def load_completed_links(jsonl_name):
+    # Links already scraped successfully by an earlier run with the same output name
+    completed = set()
+    if not os.path.exists(jsonl_name):
+        return completed
+    for _, record in iter_jsonl_records(jsonl_name):
+        if record["profile_data"]:
+            completed.add(record["profile_link"])
+    
+    # A run killed mid-write leaves a partial last line; start appending on a fresh one
+    with open(jsonl_name, 'rb+') as f:
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    return completed
+
+def write_json_artifact(jsonl_name, json_name, batch_links):
+    # Only the offset of each link's latest line stays in memory; records are re-read one at a time in input order
+    offsets = {}
+    for offset, record in iter_jsonl_records(jsonl_name):
+        offsets[record["profile_link"]] = offset
+    
+    with open(jsonl_name, 'rb') as src, open(json_name, 'wb') as f:
+        f.write(b"[")
+        for n, link in enumerate(batch_links):
+            if link in offsets:
+                src.seek(offsets[link])
+                record = orjson.loads(src.readline())
+            else:
+                record = {"profile_link": link, "profile_data": {}}
+            # Indent each element as it would be inside an OPT_INDENT_2 array
+            f.write(b",\n  " if n else b"\n  ")
+            f.write(orjson.dumps(record, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).replace(b"\n", b"\n  "))
+        f.write(b"\n]" if batch_links else b"]")
 
 def main():
     parser = argparse.ArgumentParser()
@@ -114,6 +597,7 @@ def main():
     parser.add_argument('--proxy_username', required=True)
     parser.add_argument('--proxy_password', required=True)
     parser.add_argument('--proxy_dns', required=True)
+    parser.add_argument('--debug_artifacts', action='store_true')
     args = parser.parse_args()
 
     parent_url = args.parent_url
@@ -124,80 +608,105 @@ def main():
     try:
         batch_links = json.loads(args.batch_links)
     except json.JSONDecodeError as e:
-        logging.error(f"Failed to parse batch_links JSON: {e}")
-        logging.error(f"Received batch_links: {repr(args.batch_links)}")
+        logger.error("Failed to parse batch_links JSON: %s", e)
+        logger.error("Received batch_links: %r", args.batch_links)
         # Try to get from environment variable as fallback
         batch_links_env = os.environ.get('BATCH_LINKS')
         if batch_links_env:
             try:
                 batch_links = json.loads(batch_links_env)
-                logging.info("Successfully parsed batch_links from environment variable")
+                logger.info("Successfully parsed batch_links from environment variable")
             except json.JSONDecodeError as env_e:
-                logging.error(f"Failed to parse batch_links from environment: {env_e}")
-                logging.error(f"Environment batch_links: {repr(batch_links_env)}")
+                logger.error("Failed to parse batch_links from environment: %s", env_e)
+                logger.error("Environment batch_links: %r", batch_links_env)
                 raise
         else:
             raise
     
+    # Duplicate links would only repeat the same fetch; keep the first occurrence
+    unique_links = list(dict.fromkeys(batch_links))
+    if len(unique_links) != len(batch_links):
+        logger.info("Dropped %s duplicate links", len(batch_links) - len(unique_links))
+    batch_links = unique_links
+    
     csv_filename = args.csv_filename
     proxy_username = args.proxy_username
     proxy_password = args.proxy_password
     proxy_dns = args.proxy_dns
-    proxy_selenium = f"{proxy_username}:{proxy_password}@{proxy_dns}"
+    proxy_credentials = (proxy_username, proxy_password, proxy_dns)
+    proxy_selenium = build_proxy(proxy_credentials)
 
-    batch_results = []
+    logger.info("Starting batch processing:")
+    logger.info("  - Parent URL: %s", parent_url)
+    logger.info("  - Batch number: %s", batch_number)
+    logger.info("  - Run UUID: %s", run_uuid)
+    logger.info("  - Number of links: %s", len(batch_links))
+    logger.info("  - CSV filename: %s", csv_filename)
+    logger.info("  - Proxy: %s", proxy_dns)
+    logger.info("  - Rotate proxy sessions: %s", ROTATE_PROXY_SESSIONS)
     
-    logging.info(f"Starting batch processing:")
-    logging.info(f"  - Parent URL: {parent_url}")
-    logging.info(f"  - Batch number: {batch_number}")
-    logging.info(f"  - Run UUID: {run_uuid}")
-    logging.info(f"  - Number of links: {len(batch_links)}")
-    logging.info(f"  - CSV filename: {csv_filename}")
-    logging.info(f"  - Proxy: {proxy_dns}")
+    debug_artifacts.enabled = args.debug_artifacts
+    logger.info("  - Debug artifacts: %s", debug_artifacts.enabled)
     
-    # Process all links with single Chrome session (reuse until blocked)
-    with SB(uc=True, proxy=proxy_selenium, headless=True) as sb:
-        sb.activate_cdp_mode("about:blank", tzone="America/Panama")
-        
-        for i, link in enumerate(batch_links, 1):
-            logging.info(f"Processing profile {i}/{len(batch_links)}: {link}")
+    # Results are appended as JSON Lines as soon as each profile completes
+    output_name = f"{csv_filename.replace('.csv','')}-{batch_number}-{run_uuid}"
+    json_name = f"{output_name}.json"
+    jsonl_name = f"{output_name}.jsonl"
+    
+    completed = load_completed_links(jsonl_name)
+    if completed:
+        logger.info("Skipping %s links already saved in %s", len(completed), jsonl_name)
+    
+    # Whatever happens to the workers, the .json artifact (the only file CI uploads) is rebuilt from
+    # every record streamed so far
+    try:
+        with open(jsonl_name, 'ab') as results_file:
+            # Fast path: fetch every profile concurrently over plain HTTP
+            pending_links = [link for link in batch_links if link not in completed]
+            resolved = asyncio.run(prefetch_profiles_http(pending_links, proxy_selenium, results_file))
+            logger.info("Fetched %s/%s profiles over HTTP", len(resolved), len(pending_links))
+            completed.update(resolved)
             
-            while True:
-                try:
-                    profile_info = extract_profile_info(sb, link, batch_number, i)
-                    if not profile_info:
-                        # Session might be blocked, get new driver
-                        logging.warning(f"Profile extraction failed for {link}, refreshing driver...")
-                        sb.driver.quit()
-                        sb.get_new_driver(undetectable=True, proxy=proxy_selenium)
-                        sb.activate_cdp_mode("about:blank", tzone="America/Panama")
-                        continue
-                    else:
-                        logging.info(f"Successfully extracted profile info for {link}")
-                        break
-                except Exception as e:
-                    logging.error(f"Error processing {link}: {e}")
-                    # Try refreshing the driver
-                    try:
-                        sb.driver.quit()
-                        sb.get_new_driver(undetectable=True, proxy=proxy_selenium)
-                        sb.activate_cdp_mode("about:blank", tzone="America/Panama")
-                    except Exception as refresh_error:
-                        logging.error(f"Failed to refresh driver: {refresh_error}")
-                        profile_info = {}
-                        break
+            # Only links the HTTP path couldn't resolve go to Chrome
+            browser_links = [(i, link) for i, link in enumerate(batch_links, 1) if link not in completed]
+            # Group by host so each Chrome instance keeps reusing the same proxy/host connections;
+            # the JSON artifact is written in batch_links order regardless
+            browser_links.sort(key=lambda indexed_link: urlparse(indexed_link[1]).netloc)
+            num_workers = min(NUM_CHROME_INSTANCES, len(browser_links))
+            logger.info("  - Chrome instances: %s", num_workers)
             
-            batch_results.append({
-                "profile_link": link,
-                "profile_data": profile_info
-            })
-            time.sleep(random.uniform(1, 2))
-
-    # Save batch results as JSON artifact
-    json_name = f"{csv_filename.replace('.csv','')}-{batch_number}-{run_uuid}.json"
-    with open(json_name, 'w', encoding='utf-8') as f:
-        json.dump(batch_results, f, indent=2, ensure_ascii=False)
-    logging.info(f"Batch results saved to {json_name}")
+            if num_workers:
+                # Spawn on every platform so no worker inherits driver or event-loop state from the parent
+                mp_context = multiprocessing.get_context("spawn")
+                with mp_context.Manager() as manager:
+                    results_queue = manager.Queue()
+                    link_queue = manager.Queue()
+                    for indexed_link in browser_links:
+                        link_queue.put(indexed_link)
+                    log_queue = manager.Queue()
+                    # Shared by every worker's rate limiter; handed over at process start as it can't be pickled per task
+                    browser_slot = mp_context.Value('d', 0.0)
+                    log_listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers)
+                    log_listener.start()
+                    try:
+                        with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context,
+                                                 initializer=init_worker, initargs=(log_queue, browser_slot, debug_artifacts.enabled)) as executor:
+                            futures = [
+                                executor.submit(browser_worker, link_queue, worker_id, batch_number, proxy_credentials, results_queue)
+                                for worker_id in range(1, num_workers + 1)
+                            ]
+                            drain_results_queue(results_queue, futures, results_file)
+                            for future in futures:
+                                future.result()
+                    finally:
+                        log_listener.stop()
+        logger.info("Streamed batch results to %s", jsonl_name)
+    finally:
+        # Save batch results as JSON artifact, in input order
+        write_json_artifact(jsonl_name, json_name, batch_links)
+        logger.info("Batch results saved to %s", json_name)
 
 if __name__ == "__main__":
+    # Worker processes get their handler from configure_worker_logging instead
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
     main() 
@@ -0,0 +1,31 @@
+from typing import Any
+
+# Kept free of third-party imports so setup.py can compile it with mypyc
+
+# Output field -> key path under displayUser; "Address" is formatted afterwards
+PROFILE_FIELDS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("Name", ("name",)),
+    ("Personal Phone", ("phoneNumbers", "cell")),
+    ("Business Phone", ("phoneNumbers", "business")),
+    ("Email", ("email",)),
+    ("Address", ("businessAddress",)),
+    ("Business Name", ("businessName",)),
+    ("Ratings Count", ("ratings", "count")),
+    ("Ratings Average", ("ratings", "average")),
+)
+ADDRESS_KEYS: tuple[str, ...] = ("address1", "city", "state", "postalCode")
+
+def extract_profile_info_from_json(display_user: dict[str, Any]) -> dict[str, Any]:
+    profile_info: dict[str, Any] = {}
+    for field, path in PROFILE_FIELDS:
+        value: Any = display_user
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        profile_info[field] = value
+    
+    business_address = profile_info["Address"]
+    if isinstance(business_address, dict) and all(key in business_address for key in ADDRESS_KEYS):
+        profile_info["Address"] = f"{business_address['address1']}, {business_address['city']}, {business_address['state']} {business_address['postalCode']}"
+    else:
+        profile_info["Address"] = None
+    return profile_info
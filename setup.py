@@ -0,0 +1,9 @@
+from setuptools import setup
+from mypyc.build import mypycify
+
+# Build in place with `python setup.py build_ext --inplace`; without it the pure-Python module is imported
+setup(
+    name="zillow-profile-fields",
+    py_modules=["profile_fields"],
+    ext_modules=mypycify(["profile_fields.py"]),
+)